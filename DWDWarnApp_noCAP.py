@@ -8,18 +8,22 @@ eingegebenen Ort ab. Es verwendet dazu folgende Schritte:
     eingegebenen Ort ermittelt.
 2.  **AGS-Ermittlung**: Mithilfe der Koordinaten und eines GeoJSON-Dienstes des
     DWD wird der Amtliche Gemeindeschlüssel (AGS) und der Gemeindename für den
-    Ort bestimmt. Die Geometrien der DWD-Warngemeinden werden geprüft, um die
-    passende Gemeinde zu finden.
-3.  **Warnungsabruf**: Mit dem ermittelten AGS-Code (genauer: den ersten fünf
-    Ziffern für die Kreisebene) werden die aktuellen Wetterwarnungen von der
-    JSON-Schnittstelle des DWD abgerufen.
+    Ort bestimmt.
+    Beide Schritte stellt das gemeinsame Modul `dwd_geo` bereit (inkl. Caching
+    und räumlichem Index).
+3.  **Warnungsabruf**: Die aktuellen Wetterwarnungen werden bereits beim Start
+    im Hintergrund von der JSON-Schnittstelle des DWD abgerufen. Mit dem
+    ermittelten AGS-Code (genauer: den ersten fünf Ziffern für die Kreisebene)
+    werden daraus die passenden Warnungen ausgewählt.
 4.  **Anzeige**: Die gefundenen Warnungen werden formatiert und auf der Konsole
     ausgegeben.
 
 Abhängigkeiten:
 -   requests: Für HTTP-Anfragen an die APIs.
--   shapely: Zur Verarbeitung von GeoJSON-Geometrien und zur Prüfung, ob ein
-    Punkt innerhalb eines Polygons liegt.
+-   orjson: Zum schnellen Parsen der Warnungsdaten.
+-   concurrent.futures: Zum Abruf der Warnungen im Hintergrund.
+-   dwd_geo: Gemeinsame Geo-Funktionen (Nominatim, DWD-Warngemeinden; benötigt
+    zusätzlich shapely und numpy).
 
 APIs:
 -   Nominatim (OpenStreetMap): https://nominatim.openstreetmap.org/
@@ -27,143 +31,157 @@ APIs:
 -   DWD Warnungs-API: https://www.dwd.de/DWD/warnungen/warnapp/json/warnings.json
 
 Hinweis: Für die Nutzung der Nominatim API ist ein User-Agent erforderlich.
-Passen Sie diesen ggf. an.
+Passen Sie diesen ggf. in `dwd_geo.USER_AGENT` an.
 """
 import requests
-import json
-from shapely.geometry import shape, Point
-import urllib.parse
+import functools
+import orjson
+import os
+import time
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, List, Dict, Any, Optional
 
+from dwd_geo import SESSION, REQUEST_TIMEOUT, get_coordinates, get_ags_from_coordinates
+
 # --- Konstanten ---
-NOMINATIM_URL_TEMPLATE = "https://nominatim.openstreetmap.org/search?format=json&q={}"
-DWD_GEOJSON_URL = "https://maps.dwd.de/geoserver/dwd/ows?service=WFS&version=2.0.0&request=GetFeature&typeName=dwd:Warngebiete_Gemeinden&outputFormat=application/json"
 DWD_WARNINGS_URL = "https://www.dwd.de/DWD/warnungen/warnapp/json/warnings.json"
-
-REQUEST_TIMEOUT = 10  # Sekunden
-# Passen Sie den User-Agent ggf. mit Ihrer E-Mail-Adresse oder einer Projekt-URL an
-USER_AGENT = 'DWD-WarnApp-Improved/1.1 (https://example.com/contact)'
+# JSONP-Hülle der DWD Warnungs-API
+JSONP_PREFIX = b"warnWetter.loadWarnings("
+JSONP_SUFFIX = b");"
+# Übersetzungstabelle: Zeilenumbrüche und Tabulatoren in Beschreibungstexten durch Leerzeichen ersetzen
+_TBL = str.maketrans({'\n': ' ', '\r': ' ', '\t': ' '})
 
 
 # --- Funktionen ---
 
-def get_coordinates(place: str) -> Tuple[Optional[float], Optional[float], Optional[str]]:
+@functools.lru_cache(maxsize=4096)
+def format_timestamp(ms: Optional[int]) -> str:
     """
-    Ermittelt die geografischen Koordinaten (Latitude, Longitude) eines Ortsnamens
-    über OpenStreetMap (Nominatim).
+    Wandelt einen Unix-Zeitstempel (in Millisekunden) in ein deutsches
+    Datums-/Zeitformat um. Ergebnisse werden zwischengespeichert, da Beginn und
+    Ende oft für viele Warnungen identisch sind.
 
     Args:
-        place: Der Name des Ortes.
+        ms: Zeitstempel in Millisekunden oder None.
 
     Returns:
-        Ein Tupel (Latitude, Longitude, Fehlermeldung).
-        Latitude und Longitude sind None im Fehlerfall.
-        Fehlermeldung ist None im Erfolgsfall.
+        Formatierter Zeitstring oder "N/A" falls ms None ist.
     """
-    url = NOMINATIM_URL_TEMPLATE.format(urllib.parse.quote(place))
-    headers = {'User-Agent': USER_AGENT}
+    if ms is None:
+        return "N/A"
     try:
-        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()  # Löst HTTPError für 4xx/5xx Statuscodes aus
-
-        data = response.json()
-        if data and isinstance(data, list) and len(data) > 0:
-            # Überprüfen, ob die erwarteten Schlüssel vorhanden sind
-            if "lat" in data[0] and "lon" in data[0]:
-                lat = float(data[0]["lat"])
-                lon = float(data[0]["lon"])
-                return lat, lon, None
-            else:
-                return None, None, "Fehler: Unerwartetes Datenformat von Nominatim (fehlende lat/lon)."
-        else:
-            return None, None, f"Keine Koordinaten für '{place}' gefunden."
-    except requests.exceptions.Timeout:
-        return None, None, "Fehler: Zeitüberschreitung bei der Anfrage an Nominatim."
-    except requests.exceptions.HTTPError as e:
-        return None, None, f"Fehler: HTTP-Fehler von Nominatim: {e}"
-    except requests.exceptions.RequestException as e:
-        return None, None, f"Fehler: Netzwerkproblem bei der Anfrage an Nominatim: {e}"
-    except json.JSONDecodeError:
-        return None, None, "Fehler: Ungültige JSON-Antwort von Nominatim."
-    except (ValueError, TypeError) as e:
-        return None, None, f"Fehler: Datenverarbeitungsfehler bei Nominatim-Antwort: {e}"
+        dt = datetime.fromtimestamp(ms // 1000)
+        # Direkt zusammengesetzt statt strftime: kein erneutes Parsen des Formatstrings je Aufruf
+        return f"{dt.hour:02d}:{dt.minute:02d} Uhr am {dt.day:02d}.{dt.month:02d}.{dt.year}"
+    except (ValueError, TypeError):
+        return "Ungültiger Zeitstempel"
 
 
-def get_ags_from_coordinates(lat: float, lon: float) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+def build_kreis_index(all_warnings_raw: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
     """
-    Bestimmt den AGS-Code und Gemeindenamen aus Koordinaten per DWD-GeoJSON.
+    Gruppiert die Warnungen der DWD Warnungs-API nach Kreisschlüssel (erste 5 Stellen
+    des AGS), sodass die Suche für einen Ort ein einzelner Dict-Zugriff ist.
+    Beschreibung und Handlungsempfehlung werden dabei einmalig normalisiert
+    (Zeilenumbrüche/Tabulatoren -> Leerzeichen, ohne führende/folgende Leerzeichen).
 
     Args:
-        lat: Breitengrad.
-        lon: Längengrad.
+        all_warnings_raw: Das "warnings"-Objekt der DWD-Antwort (WarnCell-ID -> Warnungen).
 
     Returns:
-        Ein Tupel (AGS-Code, Gemeindename, Fehlermeldung).
-        AGS-Code und Gemeindename sind None im Fehlerfall.
-        Fehlermeldung ist None im Erfolgsfall.
+        Ein Dictionary Kreisschlüssel -> Liste der Warnungen.
+    """
+    warnings_by_kreis: Dict[str, List[Dict[str, Any]]] = {}
+    for warncell_id_str, warnings_for_cell in all_warnings_raw.items():
+        if not isinstance(warncell_id_str, str) or len(warncell_id_str) < 6:
+            # Ungültige oder zu kurze WarnCell-ID, überspringen
+            continue
+
+        # Die WarnCellID des DWD hat oft die Form <TypZiffer><Kreisschlüssel>...
+        # z.B. 803257000 (Typ 8, Kreis 03257 ...), der Kreisschlüssel ist also warncell_id[1:6]
+        if isinstance(warnings_for_cell, list):
+            # Texte einmalig beim Einlesen normalisieren (ein Durchlauf per str.translate)
+            for w in warnings_for_cell:
+                if isinstance(w, dict):
+                    w['description'] = (w.get('description') or '').translate(_TBL).strip()
+                    w['instruction'] = (w.get('instruction') or '').translate(_TBL).strip()
+            warnings_by_kreis.setdefault(warncell_id_str[1:6], []).extend(warnings_for_cell)
+    return warnings_by_kreis
+
+
+def fetch_warnings_index() -> Tuple[Dict[str, List[Dict[str, Any]]], Optional[str]]:
+    """
+    Lädt die aktuellen Warnungen von der DWD Warnungs-API und gruppiert sie nach
+    Kreisschlüssel. Hängt nicht vom gesuchten Ort ab und kann daher parallel zur
+    Orts- und AGS-Ermittlung laufen.
+
+    Returns:
+        Ein Tupel (Kreisschlüssel -> Liste der Warnungen, Fehlermeldung).
+        Das Dictionary ist leer, wenn ein Fehler auftrat.
     """
     try:
-        response = requests.get(DWD_GEOJSON_URL, timeout=REQUEST_TIMEOUT)
+        response = SESSION.get(DWD_WARNINGS_URL, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
-        data = response.json()
-        point = Point(lon, lat)
-
-        if "features" not in data or not isinstance(data["features"], list):
-            return None, None, "Fehler: Unerwartetes Format der GeoJSON-Daten vom DWD (fehlende 'features')."
-
-        for feature in data["features"]:
-            if "geometry" not in feature or "properties" not in feature:
-                # Geometrie oder Eigenschaften fehlen im Feature, überspringen
-                continue
-
-            try:
-                geometry = shape(feature["geometry"])
-                if geometry.contains(point):
-                    properties = feature["properties"]
-                    ags = properties.get("AGS")
-                    name = properties.get("NAME", "Unbekannt")
-                    if ags:  # Sicherstellen, dass AGS vorhanden ist
-                        return ags, name, None
-            except Exception as e:  # Fängt Fehler von shapely ab (z.B. bei ungültiger Geometrie)
-                print(f"Hinweis: Fehler bei der Verarbeitung einer Geometrie: {e}")
-                continue  # Mit dem nächsten Feature fortfahren
-
-        return None, None, "Kein passendes Warngebiet (AGS) für die Koordinaten gefunden."
+        body = response.content  # Rohe Bytes: kein Dekodieren der gesamten Antwort in einen str
+
+        # JSON-P Wrapper entfernen: DWD gibt JSON in Funktion eingebettet zurück (warnWetter.loadWarnings(...);)
+        if body.startswith(JSONP_PREFIX) and body.endswith(JSONP_SUFFIX):
+            # Üblicher Fall: feste Offsets, per memoryview ohne Kopie des Inhalts
+            payload = memoryview(body)[len(JSONP_PREFIX):-len(JSONP_SUFFIX)]
+        else:
+            json_start_index = body.find(b'(')
+            json_end_index = body.rfind(b')')
+
+            if json_start_index == -1 or json_end_index == -1 or json_start_index >= json_end_index:
+                return {}, "Fehler: Unerwartetes JSONP-Format von der DWD Warnungs-API."
+            payload = memoryview(body)[json_start_index + 1:json_end_index]
+
+        data = orjson.loads(payload)
+
+        if "warnings" not in data or not isinstance(data["warnings"], dict):
+            return {}, "Fehler: Unerwartetes Format der Warnungsdaten vom DWD (fehlende 'warnings')."
+
+        # Einmaliger Durchlauf: Warnungen nach Kreisschlüssel gruppieren, danach ein Dict-Zugriff
+        return build_kreis_index(data["warnings"]), None
     except requests.exceptions.Timeout:
-        return None, None, "Fehler: Zeitüberschreitung bei der Anfrage an den DWD GeoServer."
+        return {}, "Fehler: Zeitüberschreitung bei der Anfrage an die DWD Warnungs-API."
     except requests.exceptions.HTTPError as e:
-        return None, None, f"Fehler: HTTP-Fehler vom DWD GeoServer: {e}"
+        return {}, f"Fehler: HTTP-Fehler von der DWD Warnungs-API: {e}"
     except requests.exceptions.RequestException as e:
-        return None, None, f"Fehler: Netzwerkproblem bei der Anfrage an den DWD GeoServer: {e}"
-    except json.JSONDecodeError:
-        return None, None, "Fehler: Ungültige JSON-Antwort vom DWD GeoServer."
+        return {}, f"Fehler: Netzwerkproblem bei der Anfrage an die DWD Warnungs-API: {e}"
+    except orjson.JSONDecodeError:
+        return {}, "Fehler: Ungültige JSON-Antwort von der DWD Warnungs-API."
     except Exception as e:  # Fängt andere unerwartete Fehler ab
-        return None, None, f"Unerwarteter Fehler bei der AGS-Ermittlung: {e}"
+        return {}, f"Unerwarteter Fehler beim Abrufen der Warnungen: {e}"
 
 
-def format_timestamp(ms: Optional[int]) -> str:
+def get_warnings_by_kreis_index(warnings_index: Dict[str, List[Dict[str, Any]]],
+                                ags_code: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
     """
-    Wandelt einen Unix-Zeitstempel (in Millisekunden) in ein deutsches
-    Datums-/Zeitformat um.
+    Sucht DWD-Warnungen für einen AGS-Code in einem bereits geladenen Index
+    (siehe fetch_warnings_index). Für mehrere Orte wird die Warnungs-API so nur
+    einmal abgefragt und geparst; jede Suche ist ein einzelner Dict-Zugriff.
 
     Args:
-        ms: Zeitstempel in Millisekunden oder None.
+        warnings_index: Kreisschlüssel -> Liste der Warnungen.
+        ags_code: Der AGS-Code (Amtlicher Gemeindeschlüssel).
 
     Returns:
-        Formatierter Zeitstring oder "N/A" falls ms None ist.
+        Eine Liste mit Warnmeldungen und eine optionale Fehlermeldung.
+        Die Liste ist leer, wenn keine Warnungen gefunden wurden oder ein Fehler auftrat.
     """
-    if ms is None:
-        return "N/A"
-    try:
-        return datetime.fromtimestamp(ms / 1000).strftime("%H:%M Uhr am %d.%m.%Y")
-    except (ValueError, TypeError):
-        return "Ungültiger Zeitstempel"
+    if not ags_code or len(ags_code) < 5:
+        return [], "Fehler: Ungültiger oder zu kurzer AGS-Code für die Warnungssuche."
+
+    ags_kreis = ags_code[:5]  # Die ersten 5 Ziffern des AGS repräsentieren i.d.R. den Kreis
+    # Nur lesender Zugriff: die Texte wurden bereits in build_kreis_index normalisiert
+    matched_warnings: List[Dict[str, Any]] = warnings_index.get(ags_kreis, [])
+    return matched_warnings, None
 
 
 def get_warnings_by_ags(ags_code: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
     """
-    Sucht DWD-Warnungen für einen AGS-Code.
+    Ruft die aktuellen DWD-Warnungen ab und sucht die Warnungen für einen AGS-Code.
     Vergleicht WarnCell-IDs anhand der ersten 5 Ziffern des AGS-Codes (Kreisebene).
 
     Args:
@@ -176,58 +194,26 @@ def get_warnings_by_ags(ags_code: str) -> Tuple[List[Dict[str, Any]], Optional[s
     if not ags_code or len(ags_code) < 5:
         return [], "Fehler: Ungültiger oder zu kurzer AGS-Code für die Warnungssuche."
 
-    ags_kreis = ags_code[:5]  # Die ersten 5 Ziffern des AGS repräsentieren i.d.R. den Kreis
-
-    try:
-        response = requests.get(DWD_WARNINGS_URL, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        text = response.text
-
-        # JSON-P Wrapper entfernen: DWD gibt JSON in Funktion eingebettet zurück (z.B. warnWetter.loadWarnings(...))
-        json_start_index = text.find('(')
-        json_end_index = text.rfind(')')
-
-        if json_start_index == -1 or json_end_index == -1 or json_start_index >= json_end_index:
-            return [], "Fehler: Unerwartetes JSONP-Format von der DWD Warnungs-API."
-
-        json_str = text[json_start_index + 1:json_end_index]
-        data = json.loads(json_str)
-
-        if "warnings" not in data or not isinstance(data["warnings"], dict):
-            return [], "Fehler: Unerwartetes Format der Warnungsdaten vom DWD (fehlende 'warnings')."
-
-        all_warnings_raw = data["warnings"]
-        matched_warnings: List[Dict[str, Any]] = []
-
-        # Nur Warnzellen vergleichen, deren mittlere 5 Stellen (Index 1-5) mit AGS[:5] übereinstimmen
-        # Annahme: WarnCell-ID-Format ist z.B. 'X<Kreis-ID>...'
-        for warncell_id_str, warnings_for_cell in all_warnings_raw.items():
-            if not isinstance(warncell_id_str, str) or len(warncell_id_str) < 6:
-                # Ungültige oder zu kurze WarnCell-ID, überspringen
-                continue
-
-            # Die WarnCellID des DWD hat oft die Form <TypZiffer><Kreisदर्शकSchlüssel>...
-            # z.B. 803257000 (Typ 8, Kreis 03257 ...)
-            # Der Vergleich ist hier warncell_id[1:6] == ags_kreis
-            if warncell_id_str[1:6] == ags_kreis:
-                if isinstance(warnings_for_cell, list):
-                    matched_warnings.extend(warnings_for_cell)
-
-        return matched_warnings, None
-    except requests.exceptions.Timeout:
-        return [], "Fehler: Zeitüberschreitung bei der Anfrage an die DWD Warnungs-API."
-    except requests.exceptions.HTTPError as e:
-        return [], f"Fehler: HTTP-Fehler von der DWD Warnungs-API: {e}"
-    except requests.exceptions.RequestException as e:
-        return [], f"Fehler: Netzwerkproblem bei der Anfrage an die DWD Warnungs-API: {e}"
-    except json.JSONDecodeError:
-        return [], "Fehler: Ungültige JSON-Antwort von der DWD Warnungs-API."
-    except Exception as e:  # Fängt andere unerwartete Fehler ab
-        return [], f"Unerwarteter Fehler beim Abrufen der Warnungen: {e}"
+    warnings_index, error = fetch_warnings_index()
+    if error:
+        return [], error
+    return get_warnings_by_kreis_index(warnings_index, ags_code)
 
 
 # --- Hauptprogrammablauf ---
 if __name__ == "__main__":
+    # Zeitzone einmalig festlegen (sofern nicht vorgegeben): Zeiten werden in deutscher
+    # Ortszeit angezeigt und die Zeitzonendaten nicht bei jeder Umrechnung neu ermittelt
+    os.environ.setdefault("TZ", "Europe/Berlin")
+    if hasattr(time, "tzset"):  # Nicht unter Windows verfügbar
+        time.tzset()
+
+    # Die Warnungen hängen nicht vom Ort ab: Abruf im Hintergrund, während der Benutzer
+    # den Ort eingibt und Koordinaten sowie AGS ermittelt werden
+    executor = ThreadPoolExecutor(max_workers=1)
+    warnings_future = executor.submit(fetch_warnings_index)
+    executor.shutdown(wait=False)
+
     ort = input("Ort eingeben (z.B. Köln): ")
     if not ort.strip():
         print("❌ Keine Eingabe. Bitte geben Sie einen Ort ein.")
@@ -244,7 +230,9 @@ if __name__ == "__main__":
                 print(f"❌ {error_ags}")
             elif ags and gemeindename:
                 print(f"✔ Gemeinde gefunden: {gemeindename} (AGS: {ags})")
-                warnungen, error_warn = get_warnings_by_ags(ags)
+                warnings_index, error_warn = warnings_future.result()
+                if not error_warn:
+                    warnungen, error_warn = get_warnings_by_kreis_index(warnings_index, ags)
 
                 if error_warn:
                     print(f"❌ {error_warn}")
@@ -260,13 +248,9 @@ if __name__ == "__main__":
                         print(f"🕒 Von: {format_timestamp(w.get('start'))}")
                         print(f"🕒 Bis: {format_timestamp(w.get('end'))}")
 
-                        description = w.get('description', '').replace(chr(10), ' ').strip()
-                        if not description: description = "Keine Beschreibung vorhanden."
-                        print(f"📝 Beschreibung: {description}")
-
-                        instruction = w.get('instruction', '').replace(chr(10), ' ').strip()
-                        if instruction:
-                            print(f"📋 Verhaltensempfehlung: {instruction}")
+                        print(f"📝 Beschreibung: {w['description'] or 'Keine Beschreibung vorhanden.'}")
+                        if w['instruction']:
+                            print(f"📋 Verhaltensempfehlung: {w['instruction']}")
                         print("-" * 50)
                 else:
                     print(f"✅ Keine aktuellen Warnungen für {gemeindename} (Kreisebene {ags[:5]}).")
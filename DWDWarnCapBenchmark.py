@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Dieses Skript misst, ab wie vielen deutschsprachigen <info>-Elementen sich die
+Verteilung der CAP-Auswertung auf einen Prozess-Pool lohnt, und dient als
+Grundlage für `dwd_cap.PARALLEL_MIN_INFOS`.
+
+Es erzeugt synthetische CAP-Dokumente (je Warnung ein deutsch- und ein
+englischsprachiges <info>-Element mit mehreren <area>-Elementen inkl. Polygon
+und WARNCELLID, ähnlich den COMMUNEUNION-Daten des DWD) und wertet jedes
+Dokument mit `dwd_cap.parse_warnings` einmal rein sequenziell und einmal mit
+Prozess-Pool (ab dem ersten Paket) aus. Gemessen wird jeweils die beste von
+mehreren Wiederholungen einschließlich des Starts der Worker-Prozesse, da der
+Pool in der Anwendung je Download neu entsteht.
+
+Zusätzlich wird gemessen, was der Hauptprozess auch mit Pool selbst erledigen
+muss (Streaming-Parsing, Sprachprüfung und Serialisieren der Elemente). Daraus
+ergibt sich auch auf Rechnern mit nur einem Prozessor eine untere Schranke für
+die parallele Laufzeit bei beliebig vielen Workern.
+
+Die Worker starten per "spawn" und führen dabei das Hauptskript als __mp_main__
+erneut aus. Damit ihr Startaufwand dem der Anwendung entspricht, importiert
+dieses Skript DWDWarnAPP auf Modulebene; das Skript meldet außerdem, welche
+schweren Module (dwd_geo, numpy, shapely, requests) in den Workern geladen sind.
+
+Abhängigkeiten:
+- DWDWarnAPP, dwd_cap (lxml)
+"""
+
+import argparse
+import io
+import logging
+import multiprocessing
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Wie in der Anwendung: die Worker führen beim Start die Importe von DWDWarnAPP aus
+import DWDWarnAPP  # noqa: F401
+import dwd_cap
+from lxml import etree as ET
+
+# Konfiguration für Logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Konstanten
+INFO_COUNTS = (128, 256, 512, 1024, 2048, 4096, 8192)  # Anzahl deutschsprachiger <info>-Elemente
+AREAS_PER_INFO = 8
+POLYGON_POINTS = 40
+HEAVY_MODULES = ("dwd_geo", "numpy", "shapely", "requests")
+
+
+def build_cap_document(german_infos: int, areas_per_info: int = AREAS_PER_INFO) -> bytes:
+    """
+    Erzeugt ein synthetisches CAP-Dokument.
+
+    Args:
+        german_infos (int): Anzahl deutschsprachiger <info>-Elemente (zusätzlich
+            je ein englischsprachiges).
+        areas_per_info (int): Anzahl der <area>-Elemente je <info>-Element.
+
+    Returns:
+        bytes: Das CAP-XML-Dokument.
+    """
+    polygon = " ".join(f"{50 + i / 1000:.4f},{9 + i / 1000:.4f}" for i in range(POLYGON_POINTS))
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<alert xmlns="{dwd_cap.NS["cap"]}">'
+             "<msgType>Alert</msgType>"]
+    for i in range(german_infos):
+        areas = "".join(
+            f"<area><areaDesc>Kreis {i}-{a}</areaDesc><polygon>{polygon}</polygon>"
+            f"<geocode><valueName>WARNCELLID</valueName><value>1{106000000 + i * areas_per_info + a}</value></geocode>"
+            "</area>"
+            for a in range(areas_per_info))
+        for language in ("de-DE", "en-GB"):
+            parts.append(
+                f"<info><language>{language}</language><event>STURMBÖEN</event>"
+                f"<headline>Amtliche WARNUNG vor STURMBÖEN ({i})</headline>"
+                f"<description>Es treten Sturmböen mit Geschwindigkeiten um 70 km/h auf. {'x' * 200}</description>"
+                "<onset>2026-10-15T10:00:00+02:00</onset><expires>2026-10-15T18:00:00+02:00</expires>"
+                f"<severity>Moderate</severity>{areas}</info>")
+    parts.append("</alert>")
+    return "".join(parts).encode("utf-8")
+
+
+def time_parse(document: bytes, parallel_min_infos: int, repeat: int) -> float:
+    """
+    Misst die beste Laufzeit von `dwd_cap.parse_warnings` über mehrere Wiederholungen.
+
+    Args:
+        document (bytes): Das CAP-XML-Dokument.
+        parallel_min_infos (int): Schwellwert für den Prozess-Pool.
+        repeat (int): Anzahl der Wiederholungen.
+
+    Returns:
+        float: Die beste Laufzeit in Sekunden.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        dwd_cap.parse_warnings(io.BytesIO(document), parallel_min_infos=parallel_min_infos)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_main_process(document: bytes, repeat: int) -> float:
+    """
+    Misst die beste Laufzeit des Anteils, den der Hauptprozess bei paralleler
+    Auswertung selbst trägt: Streaming-Parsing, Sprachprüfung, Serialisieren der
+    Elemente und Übernahme der (gepickelten) Ergebnisse.
+
+    Args:
+        document (bytes): Das CAP-XML-Dokument.
+        repeat (int): Anzahl der Wiederholungen.
+
+    Returns:
+        float: Die beste Laufzeit in Sekunden.
+    """
+    results = pickle.dumps(dwd_cap.parse_warnings(io.BytesIO(document), parallel_min_infos=len(document)))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        context = ET.iterparse(io.BytesIO(document), events=("end",), tag=dwd_cap.INFO_TAG, huge_tree=True)
+        for _, info in context:
+            if dwd_cap.IS_GERMAN(info):
+                ET.tostring(info, with_tail=False)
+            info.clear()
+            while info.getprevious() is not None:
+                del info.getparent()[0]
+        pickle.loads(results)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _loaded_heavy_modules(_=None) -> list:
+    """
+    Liefert die bereits geladenen schweren Module eines (Worker-)Prozesses.
+
+    Returns:
+        list: Namen der geladenen Module aus HEAVY_MODULES.
+    """
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def time_pool_startup(repeat: int) -> float:
+    """
+    Misst die beste Zeit, um einen Prozess-Pool wie in `dwd_cap.parse_warnings`
+    zu starten, jedem Worker eine leere Aufgabe zu geben und ihn zu beenden.
+
+    Args:
+        repeat (int): Anzahl der Wiederholungen.
+
+    Returns:
+        float: Die beste Laufzeit in Sekunden.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=dwd_cap.PARALLEL_MAX_WORKERS,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            list(pool.map(_loaded_heavy_modules, range(dwd_cap.PARALLEL_MAX_WORKERS)))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    """
+    Hauptfunktion des Skripts.
+    Misst sequenzielle und parallele Auswertung für verschiedene Dokumentgrößen.
+    """
+    parser = argparse.ArgumentParser(description="Misst die parallele Auswertung der CAP-Warndaten.")
+    parser.add_argument("--repeat", type=int, default=3, help="Wiederholungen je Messung (Bestwert zählt)")
+    parser.add_argument("--areas", type=int, default=AREAS_PER_INFO, help="<area>-Elemente je <info>-Element")
+    parser.add_argument("--workers", type=int, default=dwd_cap.PARALLEL_MAX_WORKERS,
+                        help="Worker-Prozesse (Standard: dwd_cap.PARALLEL_MAX_WORKERS)")
+    args = parser.parse_args()
+    dwd_cap.PARALLEL_MAX_WORKERS = args.workers
+
+    logging.info(f"Worker-Prozesse: {dwd_cap.PARALLEL_MAX_WORKERS}, Paketgröße: {dwd_cap.PARALLEL_BATCH_SIZE}, "
+                 f"aktueller Schwellwert: {dwd_cap.PARALLEL_MIN_INFOS}")
+    if dwd_cap.PARALLEL_MAX_WORKERS < 2:
+        logging.warning("Mit nur einem Worker wertet parse_warnings immer sequenziell aus; "
+                        "zum Messen --workers 2 oder mehr angeben.")
+        startup = None
+    else:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            worker_modules = pool.submit(_loaded_heavy_modules).result()
+        startup = time_pool_startup(args.repeat)
+        logging.info(f"Schwere Module im Worker: {', '.join(worker_modules) or 'keine'}; "
+                     f"Start des Pools: {startup * 1000:.1f} ms")
+
+    for german_infos in INFO_COUNTS:
+        document = build_cap_document(german_infos, args.areas)
+        sequential = time_parse(document, german_infos + 1, args.repeat)
+        main_process = time_main_process(document, args.repeat)
+        message = (f"{german_infos:5d} Infos ({len(document) / 1e6:6.1f} MB): sequenziell {sequential * 1000:8.1f} ms, "
+                   f"davon Hauptprozess auch mit Pool {main_process * 1000:8.1f} ms")
+        if dwd_cap.PARALLEL_MAX_WORKERS > 1:
+            parallel = time_parse(document, 0, args.repeat)
+            message += f", Prozess-Pool {parallel * 1000:8.1f} ms (Faktor {sequential / parallel:4.2f})"
+        logging.info(message)
+
+    if startup is not None:
+        # Höchstens der nicht im Hauptprozess verbleibende Anteil lässt sich einsparen;
+        # ab dieser Anzahl weiterer Infos gleicht das den Start des Pools aus
+        saved_per_info = (sequential - main_process) / german_infos
+        logging.info(f"Untere Schranke für den Nutzen des Pools (beliebig viele Prozessoren): "
+                     f"ca. {startup / saved_per_info:.0f} Infos")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,52 +4,76 @@ Dieses Skript lädt GeoJSON-Daten der DWD-Warngemeinden von einem öffentlichen
 WFS-Dienst des Deutschen Wetterdienstes (DWD).
 Anschließend visualisiert es diese Daten als Karte mithilfe von GeoPandas und
 Matplotlib und speichert die resultierende Karte als PNG-Datei.
+Mit `--show` wird die Karte zusätzlich in einem Fenster angezeigt.
 
 Abhängigkeiten:
 - geopandas
+- pyogrio: Schnelles Lesen/Schreiben (FlatGeobuf-Cache unter ~/.cache/dwd_warn)
 - matplotlib
+- shapely, numpy: Aufbereitung der Koordinaten für den Plot
 - requests
+- dwd_geo: Gemeinsamer Cache der Warngebiete unter ~/.cache/dwd_warn
 
 Verwendete Datenquelle:
 DWD GeoServer - Warngebiete_Gemeinden
 URL: https://maps.dwd.de/geoserver/dwd/ows?service=WFS&version=2.0.0&request=GetFeature&typeName=dwd:Warngebiete_Gemeinden&outputFormat=application/json
 """
 
+import argparse
 import geopandas as gpd
+import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.collections import PathCollection
+from matplotlib.path import Path
+import numpy as np
+import shapely
 import requests
+import pyogrio
 from io import BytesIO
 import logging
+import os
 import sys
+from typing import Optional, Tuple
+
+from dwd_geo import CACHE_DIR, DWD_GEOJSON_URL, fetch_gemeinden_geojson
 
 # Konfiguration für Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Konstanten
-GEOJSON_URL = "https://maps.dwd.de/geoserver/dwd/ows?service=WFS&version=2.0.0&request=GetFeature&typeName=dwd:Warngebiete_Gemeinden&outputFormat=application/json"
+GEOJSON_URL = DWD_GEOJSON_URL
 OUTPUT_FILENAME = "dwd_warngebiete_gemeinden.png"
 PLOT_TITLE = "DWD Warngebiete (Gemeinden)"
+FIGURE_SIZE = (10, 12)  # Zoll; Figurengröße für bessere Lesbarkeit bei vielen Gemeinden
+OUTPUT_DPI = 300
+# Die vollständige Ebene der Warngebiete ist groß; der Download braucht mehr Zeit als die übrigen Anfragen
 REQUEST_TIMEOUT = 30  # Sekunden
+PLOT_CRS = "EPSG:3035"  # ETRS89 / LAEA Europe: metrische Koordinaten, unverzerrte Darstellung Deutschlands
+# Binäre Kopie der Warngebiete (FlatGeobuf) und Cache-Kennung der zugrunde liegenden GeoJSON-Version
+FGB_CACHE_FILE = os.path.join(CACHE_DIR, "gemeinden.fgb")
+FGB_KEY_FILE = os.path.join(CACHE_DIR, "gemeinden.fgb.key")
 
-def fetch_geojson_data(url: str) -> bytes:
+def fetch_geojson_data() -> Tuple[bytes, str]:
     """
-    Lädt GeoJSON-Daten von der angegebenen URL.
-
-    Args:
-        url (str): Die URL zur GeoJSON-Datei.
+    Lädt die GeoJSON-Daten der DWD-Warngemeinden über den gemeinsamen Cache von
+    dwd_geo (~/.cache/dwd_warn). Ist eine lokale Kopie vorhanden, wird nur per
+    bedingter Anfrage (ETag/Last-Modified) geprüft, ob sie noch aktuell ist.
 
     Returns:
-        bytes: Der Inhalt der GeoJSON-Datei als Bytes.
+        Tuple[bytes, str]: Der Inhalt der GeoJSON-Datei als Bytes und die Cache-Kennung
+        (ETag/Last-Modified) dieser Version.
 
     Raises:
         requests.exceptions.RequestException: Wenn ein Fehler beim Abrufen der Daten auftritt.
     """
-    logging.info(f"Lade GeoJSON-Daten von: {url}")
+    logging.info(f"Lade GeoJSON-Daten von: {GEOJSON_URL}")
     try:
-        response = requests.get(url, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()  # Löst eine HTTPError für schlechte Antworten (4xx oder 5xx) aus
-        logging.info("Daten erfolgreich heruntergeladen.")
-        return response.content
+        content, cache_key, from_cache = fetch_gemeinden_geojson(timeout=REQUEST_TIMEOUT)
+        if from_cache:
+            logging.info("Lokale Kopie ist aktuell, Daten aus dem Cache geladen.")
+        else:
+            logging.info("Daten erfolgreich heruntergeladen.")
+        return content, cache_key
     except requests.exceptions.RequestException as e:
         logging.error(f"Fehler beim Abrufen der Daten: {e}")
         raise
@@ -69,7 +93,7 @@ def load_geodata(geojson_content: bytes) -> gpd.GeoDataFrame:
     """
     logging.info("Verarbeite GeoJSON zu GeoDataFrame...")
     try:
-        gdf = gpd.read_file(BytesIO(geojson_content))
+        gdf = gpd.read_file(BytesIO(geojson_content), engine="pyogrio")
         if gdf.empty:
             logging.warning("Das geladene GeoDataFrame ist leer. Überprüfen Sie die Datenquelle oder den Inhalt.")
         else:
@@ -79,7 +103,74 @@ def load_geodata(geojson_content: bytes) -> gpd.GeoDataFrame:
         logging.error(f"Fehler beim Laden des GeoJSON in GeoDataFrame: {e}")
         raise
 
-def plot_and_save_map(gdf: gpd.GeoDataFrame, title: str, filename: str):
+def load_cached_geodata(cache_key: str) -> Optional[gpd.GeoDataFrame]:
+    """
+    Lädt das GeoDataFrame aus der lokalen FlatGeobuf-Datei, sofern diese aus
+    derselben GeoJSON-Version (Cache-Kennung) erzeugt wurde. Das binäre Format
+    wird von pyogrio spaltenweise gelesen, ohne JSON-Parsing.
+
+    Args:
+        cache_key (str): Cache-Kennung der aktuellen GeoJSON-Daten.
+
+    Returns:
+        Optional[gpd.GeoDataFrame]: Das GeoDataFrame oder None, falls kein passender Cache existiert.
+    """
+    try:
+        with open(FGB_KEY_FILE, "r", encoding="utf-8") as f:
+            if f.read() != cache_key:
+                return None
+        gdf = pyogrio.read_dataframe(FGB_CACHE_FILE)
+        logging.info(f"GeoDataFrame aus FlatGeobuf-Cache geladen mit {len(gdf)} Einträgen.")
+        return gdf
+    except Exception:  # Fehlender oder beschädigter Cache wird einfach neu erzeugt
+        return None
+
+def save_cached_geodata(gdf: gpd.GeoDataFrame, cache_key: str):
+    """
+    Speichert das GeoDataFrame als FlatGeobuf-Datei samt Cache-Kennung. Fehler
+    werden nur protokolliert, da der Cache optional ist.
+
+    Args:
+        gdf (gpd.GeoDataFrame): Das zu speichernde GeoDataFrame.
+        cache_key (str): Cache-Kennung der zugrunde liegenden GeoJSON-Daten.
+    """
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        pyogrio.write_dataframe(gdf, FGB_CACHE_FILE, driver="FlatGeobuf")
+        with open(FGB_KEY_FILE, "w", encoding="utf-8") as f:
+            f.write(cache_key)
+    except Exception as e:
+        logging.warning(f"FlatGeobuf-Cache konnte nicht geschrieben werden: {e}")
+
+def build_path_collection(geometries: np.ndarray) -> PathCollection:
+    """
+    Erzeugt eine einzige PathCollection für alle (Multi-)Polygone. Die Koordinaten
+    werden mit wenigen vektorisierten shapely-Aufrufen ausgelesen, statt wie bei
+    GeoDataFrame.plot für jede Geometrie einzeln Patches aufzubauen.
+
+    Args:
+        geometries (np.ndarray): Array der (Multi-)Polygone.
+
+    Returns:
+        PathCollection: Ein Pfad je Geometrie (Außenringe und Löcher als Teilpfade).
+    """
+    # Teilflächen -> Ringe -> Koordinaten, jeweils mit Index auf die übergeordnete Ebene.
+    # normalize() richtet Außenringe und Löcher gegenläufig aus, damit Löcher nicht gefüllt werden.
+    parts, part_geom = shapely.get_parts(shapely.normalize(geometries), return_index=True)
+    rings, ring_part = shapely.get_rings(parts, return_index=True)
+    coords, coord_ring = shapely.get_coordinates(rings, return_index=True)
+    coord_geom = part_geom[ring_part[coord_ring]]
+
+    # Jeder Ring beginnt mit MOVETO, alle weiteren Punkte sind LINETO
+    codes = np.full(len(coords), Path.LINETO, dtype=Path.code_type)
+    codes[np.flatnonzero(np.r_[True, coord_ring[1:] != coord_ring[:-1]])] = Path.MOVETO
+
+    # Grenzen zwischen den Geometrien: ein zusammengesetzter Pfad je Geometrie
+    bounds = np.flatnonzero(np.r_[True, coord_geom[1:] != coord_geom[:-1], True])
+    paths = [Path(coords[start:end], codes[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+    return PathCollection(paths)
+
+def plot_and_save_map(gdf: gpd.GeoDataFrame, title: str, filename: str, show: bool = False):
     """
     Erstellt einen Plot des GeoDataFrames und speichert ihn als PNG-Datei.
 
@@ -87,18 +178,30 @@ def plot_and_save_map(gdf: gpd.GeoDataFrame, title: str, filename: str):
         gdf (gpd.GeoDataFrame): Das zu plottende GeoDataFrame.
         title (str): Der Titel des Plots.
         filename (str): Der Dateiname für die zu speichernde PNG-Datei.
+        show (bool): Die Karte nach dem Speichern zusätzlich in einem Fenster anzeigen.
     """
     logging.info("Erstelle Plot...")
-    fig, ax = plt.subplots(figsize=(10, 12)) # Figurengröße für bessere Lesbarkeit bei vielen Gemeinden
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE)
 
     if not gdf.empty:
-        gdf.plot(
-            ax=ax,
-            edgecolor='black',
-            facecolor='lightblue',
-            linewidth=0.2,
-            legend=False # Legende ist hier nicht relevant
-        )
+        # Auf Pixelauflösung vereinfachen: Stützpunkte, die näher als ein halbes Pixel
+        # beieinander liegen, sind in der PNG-Datei ohnehin nicht sichtbar
+        min_x, _, max_x, _ = gdf.total_bounds
+        tolerance = (max_x - min_x) / (FIGURE_SIZE[0] * OUTPUT_DPI) * 0.5
+        geometries = shapely.simplify(gdf.geometry.values, tolerance=tolerance, preserve_topology=False)
+
+        collection = build_path_collection(geometries)
+        collection.set_facecolor('lightblue')
+        collection.set_edgecolor('black')
+        collection.set_linewidth(0.2)
+        ax.add_collection(collection)
+        ax.autoscale_view()
+        if gdf.crs is None or gdf.crs.is_geographic:
+            # Wie GeoDataFrame.plot: Längengrade in der Kartenmitte maßstabsgetreu darstellen
+            min_y, max_y = gdf.total_bounds[1], gdf.total_bounds[3]
+            ax.set_aspect(1 / np.cos(np.deg2rad((min_y + max_y) / 2)))
+        else:
+            ax.set_aspect('equal')
     else:
         logging.warning("GeoDataFrame ist leer, Plot wird möglicherweise leer sein.")
         # Optional: Text auf leeren Plot schreiben
@@ -109,24 +212,44 @@ def plot_and_save_map(gdf: gpd.GeoDataFrame, title: str, filename: str):
     ax.set_title(title, fontsize=15, pad=10) # Etwas Abstand für den Titel
 
     try:
-        plt.savefig(filename, dpi=300, bbox_inches='tight')
+        plt.savefig(filename, dpi=OUTPUT_DPI, bbox_inches='tight')
         logging.info(f"Karte erfolgreich gespeichert als: {filename}")
     except Exception as e:
         logging.error(f"Fehler beim Speichern der Karte: {e}")
         # Nicht erneut raisen, damit plt.show() noch aufgerufen werden kann, falls gewünscht.
         # Besser wäre es, die main-Funktion hier zu beenden.
 
-    plt.show()
+    if show:
+        plt.show()
+    plt.close(fig)  # Speicher der (großen) Figur freigeben
 
 def main():
     """
     Hauptfunktion des Skripts.
     Führt das Laden, Verarbeiten und Plotten der DWD-Warngemeinden durch.
     """
+    parser = argparse.ArgumentParser(description="Plottet die DWD-Warngemeinden als PNG-Karte.")
+    parser.add_argument("--show", action="store_true", help="Karte zusätzlich in einem Fenster anzeigen")
+    args = parser.parse_args()
+    if not args.show:
+        # Ohne Fenster genügt das Agg-Backend: keine Initialisierung von Tk/Qt
+        matplotlib.use("Agg")
+
     try:
-        geojson_content = fetch_geojson_data(GEOJSON_URL)
-        gdf = load_geodata(geojson_content)
-        plot_and_save_map(gdf, PLOT_TITLE, OUTPUT_FILENAME)
+        geojson_content, cache_key = fetch_geojson_data()
+        gdf = load_cached_geodata(cache_key)
+        update_cache = gdf is None
+        if update_cache:
+            gdf = load_geodata(geojson_content)
+        if gdf.crs is not None and gdf.crs != PLOT_CRS:
+            # Einmal vektorisiert umprojizieren und so im Cache ablegen; ein älterer Cache
+            # in EPSG:4326 wird dabei einmalig ersetzt
+            logging.info(f"Projiziere Geometrien nach {PLOT_CRS}...")
+            gdf = gdf.to_crs(PLOT_CRS)
+            update_cache = True
+        if update_cache:
+            save_cached_geodata(gdf, cache_key)
+        plot_and_save_map(gdf, PLOT_TITLE, OUTPUT_FILENAME, show=args.show)
         logging.info("Skript erfolgreich abgeschlossen.")
     except requests.exceptions.RequestException:
         # Fehler wurde bereits in fetch_geojson_data geloggt
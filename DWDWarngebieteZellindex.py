@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Dieses Skript berechnet einmalig (offline) einen kompakten Zellindex der
+DWD-Warngemeinden für die schnelle AGS-Ermittlung in `dwd_geo`.
+
+Deutschland wird dazu in ein regelmäßiges Längen-/Breitengrad-Raster
+(`dwd_geo.CELL_GRID_RESOLUTION` Zellen pro Grad) zerlegt. Jede Rasterzelle,
+die vollständig in genau einer Warngemeinde liegt, erhält deren Nummer. Zellen
+an Gemeindegrenzen (und damit auch sehr kleine Gemeinden) bleiben leer
+(`dwd_geo.CELL_GRID_NO_GEMEINDE`); für Punkte darin prüft `dwd_geo` weiterhin
+exakt über die Polygone.
+
+Ergebnis (unter ~/.cache/dwd_warn):
+- gemeinden_raster_<id>.npy: Raster (Zeile x Spalte) mit der Gemeindenummer je
+  Zelle als uint32 (ca. 5 MB), zur Laufzeit per mmap geladen.
+- gemeinden_zellen.json: Name und Größe der Rasterdatei, Rasterdefinition, AGS
+  und Namen der Gemeinden, die Cache-Kennung der zugrunde liegenden
+  GeoJSON-Version und das Datum des Aufbaus.
+
+Ändern sich die Warngebiete des DWD oder ist der Index älter als
+`dwd_geo.CELL_INDEX_MAX_AGE_DAYS` Tage, verwirft `dwd_geo` ihn und das Skript
+sollte erneut ausgeführt werden (z.B. regelmäßig per cron).
+
+Abhängigkeiten:
+- dwd_geo (shapely, numpy, orjson, requests)
+"""
+
+import logging
+import math
+import os
+import sys
+import uuid
+from datetime import date
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import orjson
+import requests
+import shapely
+from shapely.strtree import STRtree
+
+import dwd_geo
+
+# Konfiguration für Logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Konstanten
+ROWS_PER_BLOCK = 64  # Rasterzeilen, die gemeinsam geprüft werden (begrenzt den Speicherbedarf)
+
+
+def build_cell_index(tree: STRtree, ags_codes: np.ndarray, names: np.ndarray) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Ordnet jede Rasterzelle, die vollständig in genau einer Warngemeinde liegt,
+    dieser Gemeinde zu.
+
+    Args:
+        tree (STRtree): Räumlicher Index der Warngemeinden.
+        ags_codes (np.ndarray): AGS-Codes der Gemeinden in Index-Reihenfolge.
+        names (np.ndarray): Namen der Gemeinden in Index-Reihenfolge.
+
+    Returns:
+        Tuple[np.ndarray, Dict[str, Any]]: Das Raster (Zeile x Spalte -> Gemeindenummer)
+        und die Metadaten (Rasterdefinition, AGS und Namen der Gemeinden).
+    """
+    resolution = dwd_geo.CELL_GRID_RESOLUTION
+    lat_min, lon_min = dwd_geo.CELL_GRID_LAT_MIN, dwd_geo.CELL_GRID_LON_MIN
+    rows = math.ceil((dwd_geo.CELL_GRID_LAT_MAX - lat_min) * resolution)
+    cols = math.ceil((dwd_geo.CELL_GRID_LON_MAX - lon_min) * resolution)
+    logging.info(f"Prüfe {rows * cols} Rasterzellen ({rows} x {cols})...")
+
+    cell_parts = []
+    geom_parts = []
+    col_idx = np.arange(cols)
+    for first_row in range(0, rows, ROWS_PER_BLOCK):
+        block_rows = np.arange(first_row, min(first_row + ROWS_PER_BLOCK, rows))
+        row_grid, col_grid = np.meshgrid(block_rows, col_idx, indexing="ij")
+        row_grid, col_grid = row_grid.ravel(), col_grid.ravel()
+        boxes = shapely.box(lon_min + col_grid / resolution, lat_min + row_grid / resolution,
+                            lon_min + (col_grid + 1) / resolution, lat_min + (row_grid + 1) / resolution)
+
+        # Nur Zellen, die vollständig innerhalb einer Gemeinde liegen
+        box_idx, geom_idx = tree.query(boxes, predicate="within")
+        cell_parts.append(row_grid[box_idx] * cols + col_grid[box_idx])
+        geom_parts.append(geom_idx)
+
+    cells = np.concatenate(cell_parts)
+    geoms = np.concatenate(geom_parts)
+
+    # Zellen, die (bei überlappenden Geometrien) mehreren Gemeinden zugeordnet sind, verwerfen
+    unique_cells, counts = np.unique(cells, return_counts=True)
+    unambiguous = np.isin(cells, unique_cells[counts == 1])
+    cells, geoms = cells[unambiguous], geoms[unambiguous]
+
+    # Verwendete Gemeinden fortlaufend durchnummerieren
+    used_geoms, gemeinde_idx = np.unique(geoms, return_inverse=True)
+
+    grid = np.full((rows, cols), dwd_geo.CELL_GRID_NO_GEMEINDE, dtype="<u4")
+    grid.flat[cells] = gemeinde_idx
+
+    meta = {
+        "lat_min": lat_min,
+        "lon_min": lon_min,
+        "resolution": resolution,
+        "ags": ags_codes[used_geoms].tolist(),
+        "names": names[used_geoms].tolist(),
+    }
+    logging.info(f"{len(cells)} von {rows * cols} Zellen liegen eindeutig in einer von {len(used_geoms)} Gemeinden.")
+    return grid, meta
+
+
+def _write_file_atomic(path: str, write):
+    """
+    Schreibt eine Datei über eine temporäre Datei und ersetzt das Ziel erst nach
+    vollständigem Schreiben. Fehler werden (anders als im optionalen Cache von
+    dwd_geo) weitergereicht; die temporäre Datei wird entfernt.
+
+    Args:
+        path (str): Zielpfad.
+        write (Callable): Schreibt den Inhalt in das übergebene Dateiobjekt.
+
+    Raises:
+        OSError: Wenn die Datei nicht geschrieben werden kann.
+    """
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def save_cell_index(grid: np.ndarray, meta: Dict[str, Any]):
+    """
+    Speichert Raster und Metadaten des Zellindex im Cache-Verzeichnis von dwd_geo.
+    Das Raster erhält einen eigenen Dateinamen je Aufbau; erst das (atomare)
+    Ersetzen der Metadaten schaltet auf den neuen Index um. Laufende Programme
+    sehen so immer ein zueinander passendes Paar.
+
+    Args:
+        grid (np.ndarray): Das Raster (Zeile x Spalte -> Gemeindenummer).
+        meta (Dict[str, Any]): Rasterdefinition sowie AGS und Namen der Gemeinden.
+
+    Raises:
+        OSError: Wenn Raster oder Metadaten nicht geschrieben werden können.
+    """
+    os.makedirs(dwd_geo.CACHE_DIR, exist_ok=True)
+    grid_file = f"{dwd_geo.CELL_INDEX_FILE_PREFIX}{uuid.uuid4().hex}.npy"
+    meta = dict(meta, grid_file=grid_file, rows=grid.shape[0], cols=grid.shape[1])
+
+    _write_file_atomic(os.path.join(dwd_geo.CACHE_DIR, grid_file), lambda f: np.save(f, grid))
+    _write_file_atomic(dwd_geo.CELL_INDEX_META_FILE, lambda f: f.write(orjson.dumps(meta)))
+    logging.info(f"Zellindex gespeichert unter: {dwd_geo.CELL_INDEX_META_FILE} ({grid_file})")
+
+    # Raster früherer Aufbauten entfernen (unter Windows ggf. noch von laufenden Programmen geöffnet)
+    for name in os.listdir(dwd_geo.CACHE_DIR):
+        if name.startswith(dwd_geo.CELL_INDEX_FILE_PREFIX) and name.endswith(".npy") and name != grid_file:
+            try:
+                os.remove(os.path.join(dwd_geo.CACHE_DIR, name))
+            except OSError:
+                pass
+
+
+def main():
+    """
+    Hauptfunktion des Skripts.
+    Lädt die Warngemeinden, berechnet den Zellindex und speichert ihn.
+    """
+    try:
+        tree, ags_codes, names = dwd_geo.get_gemeinden_index()
+        grid, meta = build_cell_index(tree, ags_codes, names)
+        # GeoJSON-Version und Datum des Aufbaus; dwd_geo ignoriert den Index, sobald sich
+        # die Version ändert oder er älter als dwd_geo.CELL_INDEX_MAX_AGE_DAYS Tage ist
+        meta["geojson_key"] = dwd_geo.get_geojson_cache_key()
+        meta["built"] = date.today().isoformat()
+        save_cell_index(grid, meta)
+        logging.info("Skript erfolgreich abgeschlossen.")
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Abbruch des Skripts aufgrund eines Netzwerkfehlers: {e}")
+        sys.exit(1)  # Beendet das Skript mit einem Fehlercode
+    except Exception as e:
+        # Allgemeine Fehlerbehandlung für andere Ausnahmen
+        logging.error(f"Ein unerwarteter Fehler ist aufgetreten: {e}")
+        sys.exit(1)  # Beendet das Skript mit einem Fehlercode
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Auswertung der CAP-XML-Warndaten (Common Alerting Protocol) des DWD.
+
+Das Modul ist bewusst schlank gehalten: Neben der Standardbibliothek wird nur
+lxml importiert. Die Worker-Prozesse, auf die sehr viele <info>-Elemente
+verteilt werden, starten per "spawn" und führen dabei das Hauptskript als
+__mp_main__ erneut aus. DWDWarnAPP importiert requests und dwd_geo (numpy,
+shapely, HTTP-Session) deshalb erst in seinen Funktionen, sodass die Worker nur
+die Standardbibliothek, lxml und dieses Modul laden.
+
+Abhängigkeiten:
+- lxml: Zum (inkrementellen) Parsen der CAP-XML-Warndaten.
+- concurrent.futures / multiprocessing: Zur parallelen Auswertung sehr vieler
+  Warnungen.
+"""
+
+import itertools
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, List, NamedTuple
+
+from lxml import etree as ET
+
+# Ab dieser Anzahl deutschsprachiger <info>-Elemente (z.B. bei Unwetterlagen) werden
+# die weiteren Elemente in Paketen an einen Prozess-Pool verteilt. Laut
+# DWDWarnCapBenchmark.py bleiben rund 65 % der Arbeit (Parsen, Serialisieren,
+# Ergebnisse übernehmen) im Hauptprozess, und der Start von zwei Workern mit den
+# Importen von DWDWarnAPP kostet etwa 80 ms; der Pool lohnt sich daher erst ab
+# rund 3500 weiteren Elementen.
+PARALLEL_MIN_INFOS = 4096
+PARALLEL_BATCH_SIZE = 128
+PARALLEL_CHUNKSIZE = 16
+# Obergrenze der Worker-Prozesse; der Hauptprozess liest und serialisiert die
+# Elemente selbst und kann ohnehin nur wenige Worker auslasten
+PARALLEL_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+# XML Namespaces
+NS = {'cap': 'urn:oasis:names:tc:emergency:cap:1.2'}
+INFO_TAG = "{urn:oasis:names:tc:emergency:cap:1.2}info"
+
+# Prüft, ob ein <info>-Element deutschsprachig ist (entspricht language.strip().lower() == "de-de")
+IS_GERMAN = ET.XPath('translate(normalize-space(cap:language), "DE", "de") = "de-de"', namespaces=NS)
+
+# Vorkompilierte XPath-Ausdrücke für die Felder eines <info>-Elements
+# (smart_strings=False: Ergebnisse halten keine Referenz auf das Element, das danach freigegeben wird)
+EVENT = ET.XPath("cap:event/text()", namespaces=NS, smart_strings=False)
+HEADLINE = ET.XPath("cap:headline/text()", namespaces=NS, smart_strings=False)
+DESCRIPTION = ET.XPath("cap:description/text()", namespaces=NS, smart_strings=False)
+ONSET = ET.XPath("cap:onset/text()", namespaces=NS, smart_strings=False)
+EXPIRES = ET.XPath("cap:expires/text()", namespaces=NS, smart_strings=False)
+SEVERITY = ET.XPath("cap:severity/text()", namespaces=NS, smart_strings=False)
+AREAS = ET.XPath("cap:area", namespaces=NS)
+AREA_DESC = ET.XPath("cap:areaDesc/text()", namespaces=NS, smart_strings=False)
+# True, wenn das <area>-Element ein nicht-leeres <polygon> enthält
+HAS_POLYGON = ET.XPath("boolean(cap:polygon[normalize-space()])", namespaces=NS)
+# Liefert direkt alle WARNCELLIDs eines <area>-Elements
+WARNCELL_IDS = ET.XPath('cap:geocode[cap:valueName="WARNCELLID"]/cap:value/text()', namespaces=NS,
+                        smart_strings=False)
+
+
+class CapWarning(NamedTuple):
+    """
+    Eine aus dem CAP-XML extrahierte Warnung für eine Warnzelle. Als NamedTuple
+    deutlich speichersparender als ein Dictionary je Warnung.
+    """
+    event: str
+    headline: str
+    description: str
+    onset: str
+    expires: str
+    severity: str
+    msg_type: str
+    area_desc: str
+    has_polygon: str  # "ja" oder "nein"
+    warncell_id: str
+    ags_code: str  # AGS der gewarnten Region
+
+
+# Funktion, um die Warnungen eines einzelnen <info>-Elements zu extrahieren
+def parse_info(info, msg_type):
+    """
+    Diese Funktion liest die Felder eines CAP-<info>-Elements aus und liefert für
+    jede enthaltene WARNCELLID einen Eintrag. Die Sprache wird vorher vom Aufrufer
+    per IS_GERMAN geprüft.
+    """
+    # Felder mit wenigen verschiedenen Werten (z.B. "Minor", "Severe") werden interniert,
+    # damit tausende Warnungen sich dieselben String-Objekte teilen
+    event = sys.intern((EVENT(info) or ["Unbekannt"])[0])
+    headline = (HEADLINE(info) or [""])[0]
+    description = (DESCRIPTION(info) or [""])[0]
+    onset = (ONSET(info) or ["k.A."])[0]
+    expires = (EXPIRES(info) or ["k.A."])[0]
+    severity = sys.intern((SEVERITY(info) or ["Unbekannt"])[0])
+
+    warnings = []
+    for area in AREAS(info):
+        area_desc = (AREA_DESC(area) or ["Unbekannte Region"])[0]
+        has_polygon = "ja" if HAS_POLYGON(area) else "nein"
+
+        for warncell_id in WARNCELL_IDS(area):
+            # Entferne die führende Ziffer in der Warncell-ID, um den AGS-Code zu erhalten
+            # DWD WARNCELLIDs für COMMUNEUNION sind oft 1 gefolgt vom AGS des Kreises/Gemeindeverbands
+            ags_code_from_warncell = warncell_id[1:] if warncell_id.startswith('1') and len(
+                warncell_id) > 1 else warncell_id
+
+            warnings.append(CapWarning(
+                event=event,
+                headline=headline,
+                description=description,
+                onset=onset,
+                expires=expires,
+                severity=severity,
+                msg_type=msg_type,
+                area_desc=area_desc,
+                has_polygon=has_polygon,
+                warncell_id=warncell_id,
+                ags_code=ags_code_from_warncell  # AGS der gewarnten Region
+            ))
+    return warnings
+
+
+# Funktion, um ein serialisiertes <info>-Element in einem Worker-Prozess auszuwerten
+def parse_info_fragment(fragment, msg_type):
+    """
+    Diese Funktion parst ein per ET.tostring serialisiertes <info>-Element erneut
+    und liefert dessen Warnungen. Sie steht auf Modulebene, damit sie an die
+    Prozesse des ProcessPoolExecutor übergeben werden kann.
+    """
+    return parse_info(ET.fromstring(fragment), msg_type)
+
+
+# Funktion, um alle Warnungen aus einer CAP-XML-Datei zu extrahieren
+def parse_warnings(xml_file: BinaryIO, parallel_min_infos: int = PARALLEL_MIN_INFOS) -> List[CapWarning]:
+    """
+    Diese Funktion liest eine CAP-XML-Datei per Streaming ein und liefert die
+    Warnungen aller deutschsprachigen <info>-Elemente in Dokumentreihenfolge.
+    Ab `parallel_min_infos` solcher Elemente werden die weiteren in Paketen an
+    einen Prozess-Pool verteilt (nur bei mindestens zwei möglichen Workern).
+    """
+    warnings = []
+    # Streaming-Parsing: iterparse liest die Datei stückweise, d.h. Entpacken und
+    # Parsen laufen verzahnt. Jedes <info>-Element wird verarbeitet, sobald es
+    # vollständig eingelesen ist, und danach wieder freigegeben.
+    # huge_tree=True hebt die libxml2-Grenzen für sehr große Textknoten/Dokumente auf.
+    context = ET.iterparse(xml_file, events=("end",), tag=INFO_TAG, huge_tree=True)
+    msg_type = None
+    german_infos = 0
+    parallel = PARALLEL_MAX_WORKERS > 1
+    # Bei sehr vielen <info>-Elementen übernimmt ein Prozess-Pool die (CPU-lastige)
+    # Auswertung; die Ergebnis-Iteratoren von pool.map bleiben in Dokumentreihenfolge.
+    pool = None
+    batch = []
+    pending = []
+    try:
+        for _, info in context:
+            if msg_type is None:
+                # <msgType> steht im <alert> (Elternelement) vor den <info>-Elementen und ist daher
+                # bereits geparst; context.root ist erst nach dem Ende des Dokuments gesetzt
+                msg_type_elem = info.getparent().find("cap:msgType", NS)
+                msg_type = sys.intern(msg_type_elem.text) if msg_type_elem is not None and msg_type_elem.text else "Unbekannt"
+
+            # Nur deutschsprachige Infos auswerten; der Test läuft komplett in libxml2
+            if IS_GERMAN(info):
+                german_infos += 1
+                if not parallel or german_infos <= parallel_min_infos:
+                    warnings.extend(parse_info(info, msg_type))
+                else:
+                    batch.append(ET.tostring(info, with_tail=False))
+                    if len(batch) >= PARALLEL_BATCH_SIZE:
+                        if pool is None:
+                            # "spawn", da die Auswertung in einem Thread laufen kann (fork wäre dort unsicher)
+                            pool = ProcessPoolExecutor(max_workers=PARALLEL_MAX_WORKERS,
+                                                       mp_context=multiprocessing.get_context("spawn"))
+                        pending.append(pool.map(parse_info_fragment, batch, itertools.repeat(msg_type),
+                                                chunksize=PARALLEL_CHUNKSIZE))
+                        batch = []
+
+            # Verarbeitetes Element samt vorheriger Geschwister löschen,
+            # damit der Speicherbedarf unabhängig von der Anzahl der Warnungen bleibt
+            info.clear()
+            while info.getprevious() is not None:
+                del info.getparent()[0]
+
+        # Ergebnisse der Worker in Reihenfolge übernehmen, Rest des letzten Pakets direkt auswerten
+        for results in pending:
+            for info_warnings in results:
+                warnings.extend(info_warnings)
+        for fragment in batch:
+            warnings.extend(parse_info_fragment(fragment, msg_type))
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return warnings
@@ -0,0 +1,739 @@
+# -*- coding: utf-8 -*-
+"""
+Gemeinsame Geo-Funktionen für die DWD-Warn-Skripte (DWDWarnAPP.py und
+DWDWarnApp_noCAP.py).
+
+1.  **Koordinatenermittlung** (`get_coordinates`, `geocode_many`): Über die
+    Nominatim API von OpenStreetMap werden die geografischen Koordinaten eines
+    Ortsnamens ermittelt. Ergebnisse werden im Prozess (lru_cache) und dauerhaft
+    unter ~/.cache/dwd_warn (shelve) zwischengespeichert; Anfragen an Nominatim
+    werden auf eine pro Sekunde gedrosselt.
+2.  **AGS-Ermittlung** (`get_ags_from_coordinates`, `get_ags_batch`): Der DWD
+    GeoServer liefert per CQL-Filter direkt die Warngemeinde zu einem Punkt.
+    Unterstützt er den Filter nicht, werden die Geometrien der DWD-Warngemeinden
+    einmal in einen räumlichen Index (STRtree) geladen. Liegt ein mit
+    DWDWarngebieteZellindex.py erzeugter Zellindex vor, werden Punkte abseits
+    der Gemeindegrenzen direkt darüber beantwortet. Die Warngebiete werden
+    unter ~/.cache/dwd_warn zwischengespeichert und nur bei Änderungen
+    (ETag/Last-Modified) erneut heruntergeladen. Abfragen werden auf
+    ~10 m gerundet im Prozess zwischengespeichert.
+
+Alle HTTP-Anfragen laufen über die gemeinsame Session `SESSION`.
+
+Abhängigkeiten:
+-   requests: Für HTTP-Anfragen an die APIs (gemeinsame Session mit Keep-Alive,
+    gzip und automatischen Wiederholungen).
+-   brotli (optional): Brotli-komprimierte Antworten (Accept-Encoding: br).
+-   orjson: Zum schnellen Parsen der Nominatim-Antworten und der (großen)
+    GeoJSON-Daten der Warngebiete.
+-   shapely (>= 2.0): Zur Verarbeitung von GeoJSON-Geometrien, für den
+    räumlichen Index (STRtree) und zur Prüfung, ob ein Punkt innerhalb eines
+    Polygons liegt (vorbereitete Geometrien, vektorisierte Abfragen).
+-   numpy: Für die vektorisierte Abfrage vieler Koordinaten (get_ags_batch).
+
+Hinweis: Für die Nutzung der Nominatim API ist ein User-Agent erforderlich.
+Passen Sie `USER_AGENT` ggf. an.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
+import functools
+import hashlib
+import math
+import orjson
+import os
+import pickle
+import shelve
+import threading
+import time
+import numpy as np
+import shapely
+from shapely.geometry import shape, Point
+from shapely.strtree import STRtree
+import urllib.parse
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, List, Dict, Any, Optional, Sequence
+
+# --- Konstanten ---
+# Nur das beste Ergebnis ohne Adress-/Namensdetails anfordern: kleinere Antwort, schnelleres Parsen
+NOMINATIM_URL_TEMPLATE = "https://nominatim.openstreetmap.org/search?format=json&limit=1&addressdetails=0&namedetails=0&q={}"
+DWD_GEOJSON_URL = "https://maps.dwd.de/geoserver/dwd/ows?service=WFS&version=2.0.0&request=GetFeature&typeName=dwd:Warngebiete_Gemeinden&outputFormat=application/json"
+WFS_GEOMETRY_ATTRIBUTE = "THE_GEOM"  # Name der Geometriespalte für CQL-Filter
+
+REQUEST_TIMEOUT = 10  # Sekunden
+# Nominatim-Nutzungsrichtlinie: höchstens eine Anfrage pro Sekunde
+NOMINATIM_MIN_INTERVAL = 1.0  # Sekunden
+GEOCODE_MAX_WORKERS = 4  # Parallele Abfragen in geocode_many (Cache-Treffer, Nominatim gedrosselt)
+# Passen Sie den User-Agent ggf. mit Ihrer E-Mail-Adresse oder einer Projekt-URL an
+USER_AGENT = 'DWD-WarnApp-Improved/1.1 (https://example.com/contact)'
+
+# Nachkommastellen, auf die Koordinaten für den AGS-Cache gerundet werden (4 ≈ 10 m)
+COORDINATE_CACHE_PRECISION = 4
+
+# Gemeinsame HTTP-Session für alle Anfragen: Verbindungen (TCP/TLS) werden
+# wiederverwendet und Antworten komprimiert übertragen. ACCEPT_ENCODING enthält
+# neben gzip/deflate auch br (bzw. zstd), sofern urllib3 es dekodieren kann
+# (Pakete brotli/zstandard installiert).
+SESSION = requests.Session()
+SESSION.headers.update({'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING})
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8,
+                                      max_retries=Retry(total=3, backoff_factor=0.3)))
+
+# Lokaler Cache für die Warngebiete (GeoJSON, ETag/Last-Modified, aufbereitete Geometrien)
+# und für bereits abgefragte Ortsnamen
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "dwd_warn")
+GEOJSON_CACHE_FILE = os.path.join(CACHE_DIR, "gemeinden.geojson")
+GEOJSON_META_FILE = os.path.join(CACHE_DIR, "gemeinden.meta.json")
+INDEX_CACHE_FILE = os.path.join(CACHE_DIR, "gemeinden.pkl")
+GEOCODE_CACHE_FILE = os.path.join(CACHE_DIR, "geocode")
+# Vorberechneter Zellindex (siehe DWDWarngebieteZellindex.py): JSON-Datei mit Rasterdefinition,
+# AGS/Namen der Gemeinden und dem Namen der zugehörigen Rasterdatei (uint32, Gemeinde je Zelle).
+# Jeder Aufbau schreibt eine neue Rasterdatei; erst das Ersetzen der JSON-Datei schaltet um.
+CELL_INDEX_FILE_PREFIX = "gemeinden_raster_"
+CELL_INDEX_META_FILE = os.path.join(CACHE_DIR, "gemeinden_zellen.json")
+# Höchstalter des Zellindex: Er beantwortet Anfragen ohne Netzwerkzugriff, daher fallen
+# Gebietsänderungen des DWD (z.B. Gemeindefusionen) nur bei einem erneuten Aufbau auf
+CELL_INDEX_MAX_AGE_DAYS = 30
+
+# Grobe Umgebung Deutschlands (mit Rand): Punkte außerhalb liegen sicher in keinem Warngebiet
+GERMANY_LAT_MIN, GERMANY_LAT_MAX = 47.0, 55.5
+GERMANY_LON_MIN, GERMANY_LON_MAX = 5.5, 15.5
+
+# Regelmäßiges Längen-/Breitengrad-Raster über Deutschland für den Zellindex
+CELL_GRID_LAT_MIN, CELL_GRID_LAT_MAX = 47.2, 55.1
+CELL_GRID_LON_MIN, CELL_GRID_LON_MAX = 5.8, 15.1
+CELL_GRID_RESOLUTION = 128  # Zellen pro Grad (ca. 870 m x 550 m)
+CELL_GRID_NO_GEMEINDE = np.iinfo(np.uint32).max  # Zelle an einer Grenze oder außerhalb der Warngebiete
+
+# Zwischenspeicher für den räumlichen Index: (Datum, STRtree, AGS-Array, Namens-Array)
+_gemeinden_index: Optional[Tuple[date, STRtree, np.ndarray, np.ndarray]] = None
+_gemeinden_index_lock = threading.Lock()
+_geocode_cache_lock = threading.Lock()
+# Zeitpunkt (time.monotonic) der letzten Nominatim-Anfrage, für die Drosselung
+_nominatim_last_request = 0.0
+_nominatim_rate_lock = threading.Lock()
+# Zwischenspeicher für den Zellindex: (Raster, Metadaten); False, wenn keiner vorhanden ist
+_cell_index: Any = None
+_cell_index_lock = threading.Lock()
+
+
+class GeoLookupError(Exception):
+    """Fehler bei der Orts- oder AGS-Ermittlung; die Nachricht ist für den Benutzer bestimmt."""
+
+
+class _PlaceNotFoundError(GeoLookupError):
+    """Nominatim kennt den Ort nicht; die Nachricht mit dem eingegebenen Namen bildet get_coordinates."""
+
+
+# --- Funktionen ---
+
+def _write_cache_file(path: str, content: bytes) -> None:
+    """
+    Schreibt eine Datei atomar in das Cache-Verzeichnis. Fehler beim Schreiben
+    werden nur gemeldet, da der Cache für den Programmablauf optional ist.
+
+    Args:
+        path: Zielpfad der Cache-Datei.
+        content: Zu schreibender Inhalt.
+    """
+    tmp_path = path + ".tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Hinweis: Cache-Datei {path} konnte nicht geschrieben werden: {e}")
+        try:
+            os.remove(tmp_path)  # Unvollständige temporäre Datei nicht liegen lassen
+        except OSError:
+            pass
+
+
+def _read_geocode_cache(key: str) -> Optional[Tuple[float, float]]:
+    """
+    Liest bereits ermittelte Koordinaten aus dem dauerhaften Geocode-Cache.
+
+    Args:
+        key: Normalisierter Ortsname.
+
+    Returns:
+        Ein Tupel (Latitude, Longitude) oder None, falls nicht vorhanden.
+    """
+    try:
+        with _geocode_cache_lock, shelve.open(GEOCODE_CACHE_FILE, flag="r") as cache:
+            return cache.get(key)
+    except Exception:  # Cache fehlt noch oder ist nicht lesbar
+        return None
+
+
+def _write_geocode_cache(key: str, coordinates: Tuple[float, float]) -> None:
+    """
+    Legt ermittelte Koordinaten im dauerhaften Geocode-Cache ab.
+
+    Args:
+        key: Normalisierter Ortsname.
+        coordinates: Tupel (Latitude, Longitude).
+    """
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with _geocode_cache_lock, shelve.open(GEOCODE_CACHE_FILE) as cache:
+            cache[key] = coordinates
+    except Exception as e:
+        print(f"Hinweis: Geocode-Cache konnte nicht geschrieben werden: {e}")
+
+
+def _wait_for_nominatim_slot() -> None:
+    """
+    Wartet, bis seit der letzten Nominatim-Anfrage (aus einem beliebigen Thread)
+    mindestens NOMINATIM_MIN_INTERVAL Sekunden vergangen sind.
+    """
+    global _nominatim_last_request
+    with _nominatim_rate_lock:
+        wait = _nominatim_last_request + NOMINATIM_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _nominatim_last_request = time.monotonic()
+
+
+@functools.lru_cache(maxsize=1024)
+def _lookup_coordinates(key: str) -> Tuple[float, float]:
+    """
+    Ermittelt die Koordinaten eines (normalisierten) Ortsnamens aus dem Geocode-Cache
+    oder per Nominatim. Fehler werden nicht zwischengespeichert.
+
+    Args:
+        key: Normalisierter Ortsname.
+
+    Returns:
+        Ein Tupel (Latitude, Longitude).
+
+    Raises:
+        GeoLookupError: Wenn keine Koordinaten ermittelt werden konnten.
+        _PlaceNotFoundError: Wenn Nominatim den Ort nicht kennt.
+    """
+    cached = _read_geocode_cache(key)
+    if cached is not None:
+        return cached
+
+    url = NOMINATIM_URL_TEMPLATE.format(urllib.parse.quote(key))
+    _wait_for_nominatim_slot()
+    try:
+        response = SESSION.get(url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()  # Löst HTTPError für 4xx/5xx Statuscodes aus
+
+        data = orjson.loads(response.content)
+        if data and isinstance(data, list) and len(data) > 0:
+            # Überprüfen, ob die erwarteten Schlüssel vorhanden sind
+            if "lat" in data[0] and "lon" in data[0]:
+                coordinates = (float(data[0]["lat"]), float(data[0]["lon"]))
+            else:
+                raise GeoLookupError("Fehler: Unerwartetes Datenformat von Nominatim (fehlende lat/lon).")
+        else:
+            raise _PlaceNotFoundError()
+    except requests.exceptions.Timeout:
+        raise GeoLookupError("Fehler: Zeitüberschreitung bei der Anfrage an Nominatim.")
+    except requests.exceptions.HTTPError as e:
+        raise GeoLookupError(f"Fehler: HTTP-Fehler von Nominatim: {e}")
+    except requests.exceptions.RequestException as e:
+        raise GeoLookupError(f"Fehler: Netzwerkproblem bei der Anfrage an Nominatim: {e}")
+    except orjson.JSONDecodeError:
+        raise GeoLookupError("Fehler: Ungültige JSON-Antwort von Nominatim.")
+    except (ValueError, TypeError) as e:
+        raise GeoLookupError(f"Fehler: Datenverarbeitungsfehler bei Nominatim-Antwort: {e}")
+
+    _write_geocode_cache(key, coordinates)
+    return coordinates
+
+
+def get_coordinates(place: str) -> Tuple[Optional[float], Optional[float], Optional[str]]:
+    """
+    Ermittelt die geografischen Koordinaten (Latitude, Longitude) eines Ortsnamens
+    über OpenStreetMap (Nominatim). Wiederholte Abfragen desselben Ortes werden aus
+    dem Cache beantwortet.
+
+    Args:
+        place: Der Name des Ortes.
+
+    Returns:
+        Ein Tupel (Latitude, Longitude, Fehlermeldung).
+        Latitude und Longitude sind None im Fehlerfall.
+        Fehlermeldung ist None im Erfolgsfall.
+    """
+    # Groß-/Kleinschreibung und Leerzeichen spielen für Nominatim keine Rolle; der
+    # normalisierte Name dient nur als Cache-Schlüssel, Meldungen nennen die Eingabe
+    key = " ".join(place.lower().split())
+    try:
+        lat, lon = _lookup_coordinates(key)
+        return lat, lon, None
+    except _PlaceNotFoundError:
+        return None, None, f"Keine Koordinaten für '{place.strip()}' gefunden."
+    except GeoLookupError as e:
+        return None, None, str(e)
+
+
+def geocode_many(places: Sequence[str]) -> List[Tuple[Optional[float], Optional[float], Optional[str]]]:
+    """
+    Ermittelt die Koordinaten mehrerer Orte. Orte aus dem Cache werden sofort
+    beantwortet, die übrigen parallel abgefragt; die Anfragen an Nominatim selbst
+    werden dabei auf eine pro Sekunde gedrosselt. Gleiche Orte werden nur einmal
+    abgefragt.
+
+    Args:
+        places: Die Namen der Orte.
+
+    Returns:
+        Eine Liste mit einem Tupel (Latitude, Longitude, Fehlermeldung) je Ort in
+        der Reihenfolge der Eingabe (siehe get_coordinates).
+    """
+    # Je normalisiertem Namen wird die erste Schreibweise abgefragt (und in Meldungen genannt)
+    unique_places: Dict[str, str] = {}
+    for place in places:
+        unique_places.setdefault(" ".join(place.lower().split()), place)
+    with ThreadPoolExecutor(max_workers=GEOCODE_MAX_WORKERS) as executor:
+        results = dict(zip(unique_places, executor.map(get_coordinates, unique_places.values())))
+    return [results[" ".join(place.lower().split())] for place in places]
+
+
+def _geojson_cache_key(meta: Dict[str, str], content: bytes) -> str:
+    """
+    Bildet die Cache-Kennung einer GeoJSON-Version. Ohne ETag und Last-Modified
+    wäre die Kennung für jede Version gleich; dann dient ein Hash des Inhalts
+    als Kennung.
+
+    Args:
+        meta: ETag/Last-Modified der Antwort.
+        content: GeoJSON-Inhalt.
+
+    Returns:
+        Die Cache-Kennung.
+    """
+    if meta.get("etag") or meta.get("last_modified"):
+        return f"{meta.get('etag', '')}|{meta.get('last_modified', '')}"
+    return "sha256:" + hashlib.sha256(content).hexdigest()
+
+
+def fetch_gemeinden_geojson(timeout: float = REQUEST_TIMEOUT) -> Tuple[bytes, str, bool]:
+    """
+    Lädt die GeoJSON-Daten der DWD-Warngemeinden. Ist eine lokale Kopie vorhanden,
+    wird eine bedingte Anfrage (If-None-Match / If-Modified-Since) gestellt und bei
+    HTTP 304 oder Netzwerkfehlern die lokale Kopie verwendet.
+
+    Args:
+        timeout: Zeitlimit der Anfrage in Sekunden.
+
+    Returns:
+        Ein Tupel (GeoJSON-Inhalt, Cache-Kennung, aus Cache).
+        Die Cache-Kennung setzt sich aus ETag und Last-Modified zusammen
+        (ohne beide: Hash des Inhalts).
+        "aus Cache" ist True, wenn die lokale Kopie verwendet wurde.
+
+    Raises:
+        requests.exceptions.RequestException: Bei Netzwerk- oder HTTP-Fehlern ohne lokale Kopie.
+    """
+    has_cache = os.path.exists(GEOJSON_CACHE_FILE)
+    meta: Dict[str, str] = {}
+    if has_cache:
+        try:
+            with open(GEOJSON_META_FILE, "rb") as f:
+                meta = orjson.loads(f.read())
+        except (OSError, ValueError):
+            meta = {}
+
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = SESSION.get(DWD_GEOJSON_URL, headers=headers, timeout=timeout)
+        if response.status_code != 304:
+            response.raise_for_status()
+            meta = {
+                "etag": response.headers.get("ETag", ""),
+                "last_modified": response.headers.get("Last-Modified", ""),
+            }
+            meta["key"] = _geojson_cache_key(meta, response.content)
+            _write_cache_file(GEOJSON_CACHE_FILE, response.content)
+            _write_cache_file(GEOJSON_META_FILE, orjson.dumps(meta))
+            return response.content, meta["key"], False
+    except requests.exceptions.RequestException as e:
+        if not has_cache:
+            raise
+        print(f"Hinweis: DWD GeoServer nicht erreichbar, verwende lokale Kopie der Warngebiete ({e}).")
+
+    with open(GEOJSON_CACHE_FILE, "rb") as f:
+        content = f.read()
+    return content, meta.get("key") or _geojson_cache_key(meta, content), True
+
+
+def get_geojson_cache_key() -> Optional[str]:
+    """
+    Liefert die Cache-Kennung der lokal gespeicherten GeoJSON-Version, ohne
+    Netzwerkzugriff.
+
+    Returns:
+        Die Cache-Kennung oder None, falls keine lokale Kopie vorhanden ist.
+    """
+    try:
+        with open(GEOJSON_META_FILE, "rb") as f:
+            meta = orjson.loads(f.read())
+        if meta.get("key"):
+            return meta["key"]
+        with open(GEOJSON_CACHE_FILE, "rb") as f:
+            return _geojson_cache_key(meta, f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _load_cached_index(cache_key: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Lädt die vorab aufbereiteten Geometrien (als WKB), AGS-Codes und Namen aus dem
+    Cache, sofern sie zur angegebenen Cache-Kennung passen.
+
+    Args:
+        cache_key: Cache-Kennung der aktuell gültigen GeoJSON-Daten.
+
+    Returns:
+        Ein Tupel (Geometrien, AGS-Codes, Namen) oder None, falls kein passender Cache existiert.
+    """
+    try:
+        with open(INDEX_CACHE_FILE, "rb") as f:
+            cached = pickle.load(f)
+        if cached.get("key") != cache_key:
+            return None
+        return shapely.from_wkb(cached["wkb"]), cached["ags"], cached["names"]
+    except Exception:  # Fehlender oder beschädigter Cache wird einfach neu aufgebaut
+        return None
+
+
+def _build_gemeinden_index() -> Tuple[STRtree, np.ndarray, np.ndarray]:
+    """
+    Erzeugt den räumlichen Index aus den (ggf. zwischengespeicherten) GeoJSON-Daten
+    bzw. dem Geometrie-Cache. AGS-Codes und Namen werden als parallele Arrays
+    (Structure of Arrays) in Index-Reihenfolge gehalten; Gemeinden ohne AGS werden
+    nicht aufgenommen.
+
+    Returns:
+        Ein Tupel (STRtree, AGS-Codes, Gemeindenamen) in Index-Reihenfolge.
+
+    Raises:
+        requests.exceptions.RequestException: Bei Netzwerk- oder HTTP-Fehlern.
+        ValueError: Bei ungültigen oder unerwartet aufgebauten GeoJSON-Daten.
+    """
+    content, cache_key, from_cache = fetch_gemeinden_geojson()
+    cached_index = _load_cached_index(cache_key) if from_cache else None
+
+    if cached_index is not None:
+        geometries, ags_codes, names = cached_index
+    else:
+        data = orjson.loads(content)  # Deutlich schneller als json bei der großen GeoJSON-Datei
+
+        if "features" not in data or not isinstance(data["features"], list):
+            raise ValueError("Unerwartetes Format der GeoJSON-Daten vom DWD (fehlende 'features').")
+
+        geometries = []
+        ags_list = []  # Gleiche Reihenfolge wie geometries
+        name_list = []
+        for feature in data["features"]:
+            properties = feature.get("properties") or {}
+            if not feature.get("geometry") or not properties.get("AGS"):
+                # Geometrie oder AGS fehlen im Feature, überspringen
+                continue
+
+            try:
+                geometries.append(shape(feature["geometry"]))
+            except Exception as e:  # Fängt Fehler von shapely ab (z.B. bei ungültiger Geometrie)
+                print(f"Hinweis: Fehler bei der Verarbeitung einer Geometrie: {e}")
+                continue  # Mit dem nächsten Feature fortfahren
+            ags_list.append(str(properties["AGS"]))
+            name_list.append(properties.get("NAME", "Unbekannt"))
+
+        geometries = np.array(geometries, dtype=object)
+        ags_codes = np.array(ags_list, dtype="U12")
+        names = np.array(name_list, dtype=object)
+
+        _write_cache_file(INDEX_CACHE_FILE, pickle.dumps(
+            {"key": cache_key, "wkb": shapely.to_wkb(geometries), "ags": ags_codes, "names": names},
+            protocol=5))  # Protokoll 5: große Byte-Puffer (WKB) ohne zusätzliche Kopien
+
+    # Vorbereitete (prepared) Geometrien: GEOS baut den Kantenindex jedes Polygons nur
+    # einmal auf, alle folgenden Punkt-in-Polygon-Tests nutzen ihn wieder
+    shapely.prepare(geometries)
+    return STRtree(geometries), ags_codes, names
+
+
+def get_gemeinden_index() -> Tuple[STRtree, np.ndarray, np.ndarray]:
+    """
+    Lädt die DWD-Warngemeinden und baut daraus einen räumlichen Index (STRtree) auf.
+    Das Ergebnis wird pro Prozess und Kalendertag nur einmal erzeugt; die
+    aufbereiteten Geometrien werden zusätzlich auf der Festplatte zwischengespeichert.
+    Die Funktion ist threadsicher.
+
+    Returns:
+        Ein Tupel (STRtree, AGS-Codes, Gemeindenamen) in Index-Reihenfolge.
+
+    Raises:
+        requests.exceptions.RequestException: Bei Netzwerk- oder HTTP-Fehlern.
+        ValueError: Bei ungültigen oder unerwartet aufgebauten GeoJSON-Daten.
+    """
+    global _gemeinden_index
+    with _gemeinden_index_lock:
+        today = date.today()
+        if _gemeinden_index is None or _gemeinden_index[0] != today:
+            _gemeinden_index = (today, *_build_gemeinden_index())
+        return _gemeinden_index[1:]
+
+
+def has_current_gemeinden_index() -> bool:
+    """
+    Prüft, ob der räumliche Index für den heutigen Tag bereits im Speicher liegt.
+
+    Returns:
+        True, wenn get_gemeinden_index() ohne Netzwerkzugriff antworten kann.
+    """
+    return _gemeinden_index is not None and _gemeinden_index[0] == date.today()
+
+
+def query_gemeinde_from_geoserver(lat: float, lon: float) -> Optional[Dict[str, Any]]:
+    """
+    Fragt per WFS mit CQL-Filter nur die Warngemeinde ab, die den Punkt enthält.
+    Der GeoServer nutzt dafür seinen eigenen räumlichen Index; übertragen werden
+    nur wenige hundert Bytes statt aller Polygone.
+
+    Args:
+        lat: Breitengrad.
+        lon: Längengrad.
+
+    Returns:
+        Die Eigenschaften der Gemeinde (mit AGS) oder None, falls keine Gemeinde passt.
+
+    Raises:
+        requests.exceptions.HTTPError: Bei HTTP-Fehlern, z.B. 400, falls CQL nicht unterstützt wird.
+        requests.exceptions.RequestException: Bei sonstigen Netzwerkfehlern.
+    """
+    cql_filter = f"CONTAINS({WFS_GEOMETRY_ATTRIBUTE}, POINT({lon} {lat}))"
+    response = SESSION.get(f"{DWD_GEOJSON_URL}&CQL_FILTER={urllib.parse.quote(cql_filter)}",
+                           timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    for feature in data.get("features", []):
+        properties = feature.get("properties") or {}
+        if properties.get("AGS"):
+            return properties
+    return None
+
+
+def get_cell_index() -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+    """
+    Lädt den vorberechneten Zellindex (per mmap) einmal pro Prozess, sofern er mit
+    DWDWarngebieteZellindex.py aus der aktuell lokal gespeicherten GeoJSON-Version
+    erzeugt wurde und höchstens CELL_INDEX_MAX_AGE_DAYS Tage alt ist. Die lokale
+    GeoJSON-Kopie wird bei Zellindex-Treffern nicht erneut beim DWD geprüft; ein
+    älterer Index (z.B. von vor Gemeindefusionen) wird daher ignoriert.
+
+    Returns:
+        Ein Tupel (Raster Zeile x Spalte -> Gemeinde, Metadaten) oder None, falls
+        kein (lesbarer) Zellindex vorhanden ist.
+    """
+    global _cell_index
+    with _cell_index_lock:
+        if _cell_index is None:
+            try:
+                with open(CELL_INDEX_META_FILE, "rb") as f:
+                    meta = orjson.loads(f.read())
+                built = meta.get("built")
+                age = (date.today() - date.fromisoformat(built)).days if isinstance(built, str) else None
+                if meta.get("geojson_key") != get_geojson_cache_key():
+                    print("Hinweis: Der Zellindex passt nicht zu den aktuellen Warngebieten und wird nicht "
+                          "verwendet. Bitte DWDWarngebieteZellindex.py erneut ausführen.")
+                    _cell_index = False
+                elif age is None or not 0 <= age <= CELL_INDEX_MAX_AGE_DAYS:
+                    print(f"Hinweis: Der Zellindex ist älter als {CELL_INDEX_MAX_AGE_DAYS} Tage und wird nicht "
+                          "verwendet. Bitte DWDWarngebieteZellindex.py erneut ausführen.")
+                    _cell_index = False
+                else:
+                    grid_file = os.path.basename(meta["grid_file"])
+                    grid = np.load(os.path.join(CACHE_DIR, grid_file), mmap_mode="r")
+                    # Raster und Metadaten müssen zueinander passen, sonst wird der Index nicht verwendet
+                    if (grid.dtype != np.uint32 or grid.shape != (meta["rows"], meta["cols"])
+                            or len(meta["ags"]) != len(meta["names"])
+                            or not all(isinstance(meta[k], (int, float)) for k in ("lat_min", "lon_min", "resolution"))):
+                        raise ValueError("Raster und Metadaten des Zellindex passen nicht zusammen.")
+                    _cell_index = (grid, meta)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                if os.path.exists(CELL_INDEX_META_FILE):
+                    print(f"Hinweis: Zellindex nicht lesbar und wird nicht verwendet ({e}).")
+                _cell_index = False
+        return _cell_index or None
+
+
+def lookup_ags_in_cell_index(lat: float, lon: float) -> Optional[Tuple[str, str]]:
+    """
+    Sucht die Rasterzelle eines Punktes im Zellindex (ein Array-Zugriff). Nur
+    Zellen, die vollständig in genau einer Warngemeinde liegen, sind belegt;
+    Punkte in Zellen an Gemeindegrenzen prüft der Aufrufer exakt über die Polygone.
+
+    Args:
+        lat: Breitengrad.
+        lon: Längengrad.
+
+    Returns:
+        Ein Tupel (AGS-Code, Gemeindename) oder None, falls kein Zellindex
+        vorhanden ist oder die Zelle nicht eindeutig ist.
+    """
+    cell_index = get_cell_index()
+    if cell_index is None:
+        return None
+    grid, meta = cell_index
+
+    row = math.floor((lat - meta["lat_min"]) * meta["resolution"])
+    col = math.floor((lon - meta["lon_min"]) * meta["resolution"])
+    if not (0 <= row < grid.shape[0] and 0 <= col < grid.shape[1]):
+        return None
+
+    gemeinde = int(grid[row, col])
+    if gemeinde == CELL_GRID_NO_GEMEINDE or gemeinde >= len(meta["ags"]):
+        return None
+    return meta["ags"][gemeinde], meta["names"][gemeinde]
+
+
+@functools.lru_cache(maxsize=1024)
+def _lookup_ags(lat: float, lon: float) -> Tuple[str, str]:
+    """
+    Ermittelt AGS-Code und Gemeindenamen zu (bereits gerundeten) Koordinaten.
+    Fehler werden nicht zwischengespeichert.
+
+    Args:
+        lat: Breitengrad.
+        lon: Längengrad.
+
+    Returns:
+        Ein Tupel (AGS-Code, Gemeindename).
+
+    Raises:
+        GeoLookupError: Wenn kein AGS ermittelt werden konnte.
+    """
+    # Schnellster Weg: Zelle liegt vollständig in einer Gemeinde (ein Array-Zugriff, kein Netzwerk)
+    cell_hit = lookup_ags_in_cell_index(lat, lon)
+    if cell_hit is not None:
+        return cell_hit
+
+    try:
+        if not has_current_gemeinden_index():
+            try:
+                properties = query_gemeinde_from_geoserver(lat, lon)
+                if properties is None:
+                    raise GeoLookupError("Kein passendes Warngebiet (AGS) für die Koordinaten gefunden.")
+                return str(properties["AGS"]), properties.get("NAME", "Unbekannt")
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or e.response.status_code != 400:
+                    raise
+                # CQL-Filter wird vom GeoServer nicht unterstützt: lokale Suche über alle Warngebiete
+
+        tree, ags_codes, names = get_gemeinden_index()
+
+        # Bounding-Box-Vorfilter über den STRtree, danach ein vektorisierter exakter Test
+        # (ein C-Aufruf) an den vorbereiteten Geometrien aller Kandidaten
+        candidates = np.sort(tree.query(Point(lon, lat)))
+        hits = candidates[shapely.contains_xy(tree.geometries[candidates], lon, lat)]
+        if len(hits):
+            return str(ags_codes[hits[0]]), names[hits[0]]
+
+        raise GeoLookupError("Kein passendes Warngebiet (AGS) für die Koordinaten gefunden.")
+    except GeoLookupError:
+        raise
+    except requests.exceptions.Timeout:
+        raise GeoLookupError("Fehler: Zeitüberschreitung bei der Anfrage an den DWD GeoServer.")
+    except requests.exceptions.HTTPError as e:
+        raise GeoLookupError(f"Fehler: HTTP-Fehler vom DWD GeoServer: {e}")
+    except requests.exceptions.RequestException as e:
+        raise GeoLookupError(f"Fehler: Netzwerkproblem bei der Anfrage an den DWD GeoServer: {e}")
+    except orjson.JSONDecodeError:
+        raise GeoLookupError("Fehler: Ungültige JSON-Antwort vom DWD GeoServer.")
+    except ValueError as e:
+        raise GeoLookupError(f"Fehler: {e}")
+    except Exception as e:  # Fängt andere unerwartete Fehler ab
+        raise GeoLookupError(f"Unerwarteter Fehler bei der AGS-Ermittlung: {e}")
+
+
+def get_ags_from_coordinates(lat: float, lon: float) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Bestimmt den AGS-Code und Gemeindenamen aus Koordinaten per DWD-GeoJSON.
+    Ist ein Zellindex vorhanden und liegt der Punkt nicht in einer Grenzzelle, genügt
+    ein Nachschlagen darin. Sonst übernimmt die Punkt-in-Polygon-Prüfung der DWD
+    GeoServer per CQL-Filter; nur wenn dieser den Filter ablehnt (HTTP 400), wird
+    lokal über den STRtree gesucht. Ist der lokale Index bereits geladen, wird er
+    direkt verwendet. Ergebnisse werden für auf COORDINATE_CACHE_PRECISION
+    Nachkommastellen gerundete Koordinaten zwischengespeichert.
+
+    Args:
+        lat: Breitengrad.
+        lon: Längengrad.
+
+    Returns:
+        Ein Tupel (AGS-Code, Gemeindename, Fehlermeldung).
+        AGS-Code und Gemeindename sind None im Fehlerfall.
+        Fehlermeldung ist None im Erfolgsfall.
+    """
+    # Orte außerhalb Deutschlands (z.B. gleichnamige Orte im Ausland) ohne Netzwerk- oder Polygonabfrage abweisen
+    if not (GERMANY_LAT_MIN <= lat <= GERMANY_LAT_MAX and GERMANY_LON_MIN <= lon <= GERMANY_LON_MAX):
+        return None, None, "Koordinaten außerhalb Deutschlands – DWD-Warngebiete nicht verfügbar."
+
+    try:
+        ags, name = _lookup_ags(round(lat, COORDINATE_CACHE_PRECISION), round(lon, COORDINATE_CACHE_PRECISION))
+        return ags, name, None
+    except GeoLookupError as e:
+        return None, None, str(e)
+
+
+def get_ags_batch(lats: Sequence[float], lons: Sequence[float]) -> Tuple[List[Tuple[Optional[str], Optional[str]]], Optional[str]]:
+    """
+    Bestimmt AGS-Codes und Gemeindenamen für viele Koordinaten auf einmal.
+    Die Kandidaten werden in einem Aufruf aus dem STRtree geholt und anschließend
+    je Gemeinde vektorisiert (shapely.contains_xy) geprüft.
+
+    Args:
+        lats: Breitengrade.
+        lons: Längengrade (gleiche Länge wie lats).
+
+    Returns:
+        Ein Tupel (Liste von (AGS-Code, Gemeindename) je Koordinate, Fehlermeldung).
+        Für Koordinaten ohne passendes Warngebiet ist der Eintrag (None, None).
+        Im Fehlerfall ist die Liste leer.
+    """
+    try:
+        tree, ags_codes, names = get_gemeinden_index()
+        geometries = tree.geometries
+        xs = np.asarray(lons, dtype=float)
+        ys = np.asarray(lats, dtype=float)
+        results: List[Tuple[Optional[str], Optional[str]]] = [(None, None)] * len(xs)
+
+        # Kandidatenpaare (Punkt, Gemeinde) per Bounding-Box, nach Gemeinde sortiert
+        point_idx, geom_idx = tree.query(shapely.points(xs, ys))
+        order = np.argsort(geom_idx, kind="stable")
+        point_idx, geom_idx = point_idx[order], geom_idx[order]
+
+        # Pro Gemeinde alle Kandidatenpunkte in einem C-Aufruf prüfen
+        hit = np.zeros(len(geom_idx), dtype=bool)
+        starts = np.flatnonzero(np.r_[True, geom_idx[1:] != geom_idx[:-1]]) if len(geom_idx) else []
+        for start, end in zip(starts, np.r_[starts[1:], len(geom_idx)]):
+            candidates = point_idx[start:end]
+            hit[start:end] = shapely.contains_xy(geometries[geom_idx[start]], xs[candidates], ys[candidates])
+
+        # Aufsteigende Gemeinde-Reihenfolge: der erste Treffer je Punkt entspricht der Einzelabfrage
+        hit_points, first = np.unique(point_idx[hit], return_index=True)
+        for point, geom in zip(hit_points, geom_idx[hit][first]):
+            results[point] = (str(ags_codes[geom]), names[geom])
+        return results, None
+    except requests.exceptions.RequestException as e:
+        return [], f"Fehler: Netzwerkproblem bei der Anfrage an den DWD GeoServer: {e}"
+    except orjson.JSONDecodeError:
+        return [], "Fehler: Ungültige JSON-Antwort vom DWD GeoServer."
+    except ValueError as e:
+        return [], f"Fehler: {e}"
+    except Exception as e:  # Fängt andere unerwartete Fehler ab
+        return [], f"Unerwarteter Fehler bei der AGS-Ermittlung: {e}"